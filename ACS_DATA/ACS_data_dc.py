@@ -1,5 +1,16 @@
-import requests
+import asyncio
+import numpy as np
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# With aiohttp all years are fetched concurrently; without it they are fetched one after another
+# over a single keep-alive requests.Session
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 # ==============================================================================
 # Step 1: Configure your request
@@ -19,70 +30,146 @@ STATE_FIPS = '11'
 COUNTY_FIPS = '001'
 
 # ==============================================================================
-# Step 2: Iterate to obtain data
+# Step 2: Fetch the data for all years
 # ==============================================================================
-all_data = []
 
-print("Starting to fetch data from the Census API...")
-
-for year in YEARS:
-    print(f"  Fetching data for the year {year}...")
-    
-    # Construct the API request URL
-    api_url = (
+# Construct the API request URL
+def build_api_url(year):
+    return (
         f'https://api.census.gov/data/{year}/acs/acs5'
         f'?get={VARIABLES}'
         f'&for=tract:*'
         f'&in=state:{STATE_FIPS}%20county:{COUNTY_FIPS}'
         f'&key={API_KEY}'
     )
-    
+
+
+# Fetch the ACS5 table for a single year; returns (year, rows), or (year, None) on failure
+async def fetch_year(session, year):
+    print(f"  Fetching data for the year {year}...")
+
+    try:
+        async with session.get(build_api_url(year)) as response:
+            response.raise_for_status()
+            # The Census API does not always send an application/json content type
+            data = await response.json(content_type=None)
+        return year, data
+
+    except aiohttp.ClientError as e:
+        print(f"    Error: Failed to fetch data for {year}. Error message: {e}")
+    except ValueError as e:
+        print(f"    Error: Failed to parse data for {year} (likely an invalid JSON response). Error message: {e}")
+    return year, None
+
+
+async def main():
+    # All years share one pooled session, so the requests overlap instead of running back to back
+    connector = aiohttp.TCPConnector(limit=16)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await asyncio.gather(*(fetch_year(session, year) for year in YEARS), return_exceptions=True)
+
+
+# Fallback when aiohttp is not installed: same per-year contract as fetch_year, but blocking
+def fetch_year_sync(session, year):
+    print(f"  Fetching data for the year {year}...")
+
     try:
-        response = requests.get(api_url)
+        response = session.get(build_api_url(year), timeout=30)
         response.raise_for_status()
+        return year, response.json()
 
-        data = response.json()
-        
-        # The first row contains column names
-        df = pd.DataFrame(data[1:], columns=data[0]) 
-        
-        df['Year'] = year
-        
-        all_data.append(df)
-        
     except requests.exceptions.RequestException as e:
         print(f"    Error: Failed to fetch data for {year}. Error message: {e}")
     except ValueError as e:
         print(f"    Error: Failed to parse data for {year} (likely an invalid JSON response). Error message: {e}")
+    return year, None
+
+
+def fetch_all_sync():
+    # Reuse one keep-alive connection for every year instead of a new TCP/TLS handshake per request,
+    # and retry transient Census API errors with backoff
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    with requests.Session() as session:
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retries))
+        return [fetch_year_sync(session, year) for year in YEARS]
+
+
+print("Starting to fetch data from the Census API...")
+
+# Output column -> Census API column. Each year's rows are parsed straight into typed arrays per
+# column; the final DataFrame is built once from the concatenated arrays
+API_COLUMNS = {
+    'Tract_Name': 'NAME',
+    'Median_Household_Income': 'B19013_001E',
+    'State_FIPS': 'state',
+    'County_FIPS': 'county',
+    'Tract_FIPS': 'tract'
+}
+all_data = {col: [] for col in ['Year', *API_COLUMNS]}
+
+for result in (asyncio.run(main()) if aiohttp is not None else fetch_all_sync()):
+    if isinstance(result, BaseException):
+        print(f"    Error: Unexpected failure while fetching data. Error message: {result}")
+        continue
+
+    year, data = result
+    if data is None:
+        continue
+
+    # The first row contains column names
+    header = data[0]
+    rows = np.array(data[1:], dtype=object).reshape(-1, len(header))
+    col_idx = {col: header.index(api_col) for col, api_col in API_COLUMNS.items()}
+
+    all_data['Year'].append(np.full(len(rows), year, dtype=np.int16))
+    all_data['Tract_Name'].append(rows[:, col_idx['Tract_Name']].astype(str))
+
+    # The API sends incomes as integer strings, so those are cast in one numpy pass; anything else
+    # (null cells, stray text) goes through to_numeric, where 'coerce' turns it into NaN
+    income_str = rows[:, col_idx['Median_Household_Income']].astype(str)
+    is_int = np.char.isdigit(np.char.lstrip(income_str, '-'))
+    income = np.empty(len(rows), dtype=np.float64)
+    income[is_int] = income_str[is_int].astype(np.int64)
+    income[~is_int] = pd.to_numeric(income_str[~is_int], errors='coerce')
+    # -666666666 is the Census placeholder for an unavailable estimate
+    income[income == -666666666] = np.nan
+    all_data['Median_Household_Income'].append(income)
+
+    # FIPS codes have fixed widths (2/3/6)
+    all_data['State_FIPS'].append(rows[:, col_idx['State_FIPS']].astype('U2'))
+    all_data['County_FIPS'].append(rows[:, col_idx['County_FIPS']].astype('U3'))
+    all_data['Tract_FIPS'].append(rows[:, col_idx['Tract_FIPS']].astype('U6'))
 
 # ==============================================================================
 # Step 3: Clean and consolidate data
 # ==============================================================================
-if all_data:
+if all_data['Year']:
     print("\nData fetching complete, now cleaning and consolidating...")
     
-    final_df = pd.concat(all_data, ignore_index=True)
-    
-    final_df = final_df.rename(columns={
-        'B19013_001E': 'Median_Household_Income',
-        'NAME': 'Tract_Name',
-        'state': 'State_FIPS',
-        'county': 'County_FIPS',
-        'tract': 'Tract_FIPS'
-    })
+    columns = {col: np.concatenate(parts) for col, parts in all_data.items()}
     
     # Create a full GEOID, which is useful for merging with other geospatial data
-    final_df['GEOID'] = final_df['State_FIPS'] + final_df['County_FIPS'] + final_df['Tract_FIPS']
-    
-    final_df['Median_Household_Income'] = pd.to_numeric(
-        final_df['Median_Household_Income'], 
-        errors='coerce' # 'coerce' will turn non-convertible values into NaN
-    )
+    # The FIPS parts are fixed-width unicode arrays, so they are concatenated in C
+    geoid = np.char.add(np.char.add(columns['State_FIPS'], columns['County_FIPS']), columns['Tract_FIPS'])
     
-    final_df = final_df[[
-        'GEOID', 'Tract_Name', 'Year', 'Median_Household_Income', 
-        'State_FIPS', 'County_FIPS', 'Tract_FIPS'
-    ]]
+    final_df = pd.DataFrame({
+        'GEOID': geoid,
+        'Tract_Name': columns['Tract_Name'],
+        'Year': columns['Year'],
+        'Median_Household_Income': pd.array(columns['Median_Household_Income']).astype('Int32'),
+        'State_FIPS': columns['State_FIPS'],
+        'County_FIPS': columns['County_FIPS'],
+        'Tract_FIPS': columns['Tract_FIPS']
+    })
+
+    # The name and FIPS columns repeat across years (and state/county are constant), so store them
+    # as categories; Year is already int16 and income nullable Int32
+    final_df = final_df.astype({
+        'Tract_Name': 'category',
+        'State_FIPS': 'category',
+        'County_FIPS': 'category',
+        'Tract_FIPS': 'category'
+    })
 
     # ==============================================================================
     # Step 4: Save and display the results
@@ -93,6 +180,13 @@ if all_data:
     
     print(f"\nSuccess! Data has been saved to the file: {output_filename}")
     
+    # The CSV stays the interchange format for the other scripts; the Parquet copy keeps the
+    # compact dtypes above and is much smaller on disk
+    parquet_filename = output_filename.replace('.csv', '.parquet')
+    final_df.to_parquet(parquet_filename, index=False)
+    
+    print(f"A typed copy has also been saved to: {parquet_filename}")
+    
     # Display the first few rows of data
     print("\nData Preview:")
     print(final_df.head())
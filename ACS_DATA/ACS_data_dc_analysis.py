@@ -2,7 +2,14 @@ import pandas as pd
 import numpy as np
 
 # Assuming the CSV file from the previous step is named this way
-df = pd.read_csv('dc_tract_median_income_2018-2023.csv') 
+# The pyarrow engine parses multithreaded, and the explicit dtypes skip type inference; the Arrow-backed
+# columns are also what the groupby('Year') statistics below run on
+df = pd.read_csv(
+    'dc_tract_median_income_2018-2023.csv',
+    engine='pyarrow',
+    dtype_backend='pyarrow',
+    dtype={'GEOID': 'string', 'Year': 'int16', 'Median_Household_Income': 'int64[pyarrow]'}
+)
 
 # --- Statistics of Median Household Income by Year ---
 income_stats_by_year = df.groupby('Year')['Median_Household_Income'].describe()
@@ -21,17 +28,34 @@ print(overall_median_income)
 
 # --- In-depth Analysis of 2022 Data ---
 
+# Top-k rows by a column using np.partition (O(N)) instead of a full sort. NaNs are never selected,
+# and ties at the cut-off are filled in row order, as with nlargest/nsmallest(keep='first')
+def k_extreme_rows(frame, col, k, largest=True):
+    values = frame[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    keys = -values if largest else values
+    valid = np.flatnonzero(~np.isnan(keys))
+    k = min(k, len(valid))
+    if k == 0:
+        return frame.iloc[[]]
+
+    kth = np.partition(keys[valid], k - 1)[k - 1]
+    below = valid[keys[valid] < kth]
+    ties = valid[keys[valid] == kth][:k - len(below)]
+    idx = np.sort(np.concatenate([below, ties]))
+    return frame.iloc[idx[np.argsort(keys[idx], kind='stable')]]
+
+
 df_2022 = df[df['Year'] == 2022].copy()
 
 # Find the 5 census tracts with the highest income in 2022
-highest_income_2022 = df_2022.nlargest(5, 'Median_Household_Income')
+highest_income_2022 = k_extreme_rows(df_2022, 'Median_Household_Income', 5, largest=True)
 
 # Find the 5 census tracts with the lowest income in 2022
-lowest_income_2022 = df_2022.nsmallest(5, 'Median_Household_Income')
+lowest_income_2022 = k_extreme_rows(df_2022, 'Median_Household_Income', 5, largest=False)
 
 print("\n--- Top 5 Census Tracts by Median Household Income in 2022 ---")
-print(tabulate(highest_income_2022[['Tract_Name', 'Median_Household_Income']], headers='keys', tablefmt='pipe', showindex=False))
+print(highest_income_2022[['Tract_Name', 'Median_Household_Income']].to_string(index=False))
 
 
 print("\n--- Bottom 5 Census Tracts by Median Household Income in 2022 ---")
-print(tabulate(lowest_income_2022[['Tract_Name', 'Median_Household_Income']], headers='keys', tablefmt='pipe', showindex=False))
\ No newline at end of file
+print(lowest_income_2022[['Tract_Name', 'Median_Household_Income']].to_string(index=False))
\ No newline at end of file
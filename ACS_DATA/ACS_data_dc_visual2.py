@@ -1,103 +1,191 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
 
-print("--- Step 1: Load and clean income data ---")
-
+# pyogrio parses the shapefile in C and hands it over as Arrow columns; fall back to Fiona if it is missing
 try:
-    # Use the actual filename
-    income_df = pd.read_csv('dc_tract_median_income_2018-2022.csv') 
-    # Replace the placeholder for missing values with pandas' NA
-    income_df['Median_Household_Income'] = income_df['Median_Household_Income'].replace(-666666666, pd.NA)
-    
-    # Ensure GEOID is a string for consistent merging
-    income_df['GEOID'] = income_df['GEOID'].astype(str)
-    
-    print("Income data loaded and cleaned successfully.")
+    import pyogrio
+    SHP_READ_KWARGS = {'engine': 'pyogrio', 'use_arrow': True}
+except ImportError:
+    SHP_READ_KWARGS = {}
+
+# ==============================================================================
+# Map rendering, run in a pool of worker processes (one year per task)
+# ==============================================================================
+# The tract outlines are identical every year, so each worker draws them once as a single
+# PolyCollection and then only recolours it for every year it is given
+worker_state = {}
+
+def init_worker(outlines, aspect):
+    # Render straight to PNG; no GUI backend is needed in the workers
+    matplotlib.use('Agg')
 
-except FileNotFoundError:
-    # Updated the error message to reflect the correct filename
-    print("Error: 'dc_tract_median_income_2018-2022.csv' file not found.") 
-    exit()
+    fig, ax = plt.subplots(1, 1, figsize=(8, 8))
 
+    income_pc = PolyCollection(outlines, cmap='viridis', edgecolor='0.8', linewidth=0.5)
+    ax.add_collection(income_pc)
 
-print("\n--- Step 2: Load Washington, D.C. geographical boundaries from a local file ---")
+    # Tracts with missing income are overlaid as a second, hatched collection
+    missing_pc = PolyCollection([], facecolor='lightgrey', edgecolor='red', hatch='///', linewidth=0.5)
+    ax.add_collection(missing_pc)
 
-shapefile_name = 'tl_2022_11_tract.shp'
+    ax.autoscale_view()
+    ax.set_aspect(aspect)
 
-try:
-    dc_tracts_gdf = gpd.read_file(shapefile_name)
-    
-    print(f"Geographical boundary data '{shapefile_name}' loaded successfully.")
-    # Ensure GEOID in the geographical data is also a string type for merging
-    if 'GEOID' in dc_tracts_gdf.columns:
-        dc_tracts_gdf['GEOID'] = dc_tracts_gdf['GEOID'].astype(str)
-    else:
-        print("Error: 'GEOID' column not found in the geographical file. Please check the Shapefile.")
-        exit()
+    # Turn off the axis for a cleaner map
+    ax.set_axis_off()
 
-except Exception as e:
-    print(f"Error: Could not load the Shapefile '{shapefile_name}'.")
-    print(f"Please ensure the file is in the same folder as the script and is not corrupted. Error message: {e}")
-    exit()
+    # --- Add a vertical color bar on the right --- #
+    # Define the position and size of the color bar axis
+    cbar_ax = fig.add_axes([0.85, 0.15, 0.03, 0.7]) 
 
+    # Create the color bar
+    cbar = fig.colorbar(income_pc, cax=cbar_ax, orientation='vertical')
+    cbar.set_label('Median Household Income (USD)', fontsize=12, rotation=270, labelpad=15)
+    cbar.ax.tick_params(labelsize=10)
 
-print("\n--- Step 3: Merge geographical and income data ---")
+    worker_state.update(
+        fig=fig, income_pc=income_pc, missing_pc=missing_pc, cbar=cbar, outlines=outlines
+    )
 
-merged_gdf = dc_tracts_gdf.merge(income_df, on='GEOID', how='left')
 
-print("Data merge complete.")
+def render_year(year, incomes):
+    print(f"  Generating map for the year {year}...")
 
-print("\n--- Step 4: Loop to generate and save a map for each year ---")
+    income_pc = worker_state['income_pc']
+    missing = np.isnan(incomes)
 
-# Get a sorted list of unique years from the data
-years = sorted(merged_gdf['Year'].dropna().unique().astype(int))
+    income_pc.set_array(np.ma.masked_invalid(incomes))
+    income_pc.set_clim(np.nanmin(incomes), np.nanmax(incomes))
+    worker_state['missing_pc'].set_verts([worker_state['outlines'][i] for i in np.flatnonzero(missing)])
+    worker_state['cbar'].update_normal(income_pc)
 
-for year in years:
-    print(f"  Generating map for the year {year}...")
-    gdf_year = merged_gdf[merged_gdf['Year'] == year]
+    # Define the output filename
+    output_filename = f'DC_Income_Map_{year}.png'
+    # Save the figure
+    worker_state['fig'].savefig(output_filename, dpi=300, bbox_inches='tight')
 
-    fig, ax = plt.subplots(1, 1, figsize=(8, 8))
+    return output_filename
 
-    gdf_year.plot(
-        column='Median_Household_Income',
-        cmap='viridis',
-        linewidth=0.5,
-        ax=ax,
-        edgecolor='0.8',
-        legend=False, # We will create a custom color bar
-        missing_kwds={  # Define the display style for missing data
-            "color": "lightgrey",
-            "edgecolor": "red",
-            "hatch": "///",
-            "label": "Missing values",
-        }
-    )
 
-    # --- Add a vertical color bar on the right --- #
-    # Define the position and size of the color bar axis
-    cbar_ax = fig.add_axes([0.85, 0.15, 0.03, 0.7]) 
+def main():
+    income_csv_name = 'dc_tract_median_income_2018-2022.csv'
+    shapefile_name = 'tl_2022_11_tract.shp'
 
-    vmin = gdf_year['Median_Household_Income'].min()
-    vmax = gdf_year['Median_Household_Income'].max()
-    norm = plt.Normalize(vmin=vmin, vmax=vmax)
-    sm = plt.cm.ScalarMappable(cmap='viridis', norm=norm)
-    sm.set_array([]) # You can pass an empty array to the scalar mappable
+    # The shapefile load and merge only need redoing when one of the inputs changes, so the merged
+    # GeoDataFrame is cached as GeoParquet and reused while it is newer than both inputs
+    merged_cache = Path('dc_income_merged.parquet')
+    cache_is_fresh = merged_cache.exists() and all(
+        not Path(name).exists() or Path(name).stat().st_mtime <= merged_cache.stat().st_mtime
+        for name in (income_csv_name, shapefile_name)
+    )
 
-    # Create the color bar
-    cbar = fig.colorbar(sm, cax=cbar_ax, orientation='vertical')
-    cbar.set_label('Median Household Income (USD)', fontsize=12, rotation=270, labelpad=15)
-    cbar.ax.tick_params(labelsize=10)
+    if cache_is_fresh:
+        print(f"--- Steps 1-3: Load the merged income and boundary data from the cache '{merged_cache}' ---")
+        merged_gdf = gpd.read_parquet(merged_cache)
 
-    # Turn off the axis for a cleaner map
-    ax.set_axis_off()
+    else:
+        print("--- Step 1: Load and clean income data ---")
+
+        try:
+            # Use the actual filename
+            # Parse with the multithreaded pyarrow engine and fixed dtypes instead of inferring them.
+            # GEOID is a fixed-width numeric code, so it is read as int64 and merged as such
+            income_df = pd.read_csv(
+                income_csv_name,
+                engine='pyarrow',
+                dtype={'GEOID': np.int64, 'Year': np.int16, 'Median_Household_Income': np.float64}
+            )
+            # Mask the Census placeholder for missing values; the column stays float64 with NaN
+            income = income_df['Median_Household_Income']
+            income_df['Median_Household_Income'] = income.mask(income.eq(-666666666))
     
-    # Define the output filename
-    output_filename = f'DC_Income_Map_{year}.png'
-    # Save the figure
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-    plt.close(fig) # Close the figure to free up memory
+            print("Income data loaded and cleaned successfully.")
+
+        except FileNotFoundError:
+            # Updated the error message to reflect the correct filename
+            print("Error: 'dc_tract_median_income_2018-2022.csv' file not found.") 
+            exit()
 
-    print(f"  Map saved as: {output_filename}")
 
-print("\nAll maps have been generated!")
\ No newline at end of file
+        print("\n--- Step 2: Load Washington, D.C. geographical boundaries from a local file ---")
+
+        try:
+            # Only GEOID and the geometry are used downstream
+            dc_tracts_gdf = gpd.read_file(shapefile_name, columns=['GEOID', 'geometry'], **SHP_READ_KWARGS)
+    
+            print(f"Geographical boundary data '{shapefile_name}' loaded successfully.")
+            # Ensure GEOID in the geographical data is also int64 for merging
+            if 'GEOID' in dc_tracts_gdf.columns:
+                dc_tracts_gdf['GEOID'] = dc_tracts_gdf['GEOID'].astype(np.int64)
+            else:
+                print("Error: 'GEOID' column not found in the geographical file. Please check the Shapefile.")
+                exit()
+
+        except Exception as e:
+            print(f"Error: Could not load the Shapefile '{shapefile_name}'.")
+            print(f"Please ensure the file is in the same folder as the script and is not corrupted. Error message: {e}")
+            exit()
+
+
+        print("\n--- Step 3: Merge geographical and income data ---")
+
+        merged_gdf = dc_tracts_gdf.merge(income_df, on='GEOID', how='left')
+
+        print("Data merge complete.")
+
+        merged_gdf.to_parquet(merged_cache, compression='zstd')
+        print(f"Merged data cached as: '{merged_cache}'")
+
+    print("\n--- Step 4: Loop to generate and save a map for each year ---")
+
+    # One row per tract (including tracts without any income rows), used for the outlines
+    tracts_gdf = merged_gdf.drop_duplicates('GEOID')
+
+    # Drop tracts without income rows and bin the rest by year in a single pass
+    merged_gdf = merged_gdf.dropna(subset=['Year'])
+    merged_gdf['Year'] = merged_gdf['Year'].astype(int)
+
+    # part_tract maps each outline back to its row in tracts_gdf
+    # (a MultiPolygon tract contributes one outline per part).
+    tract_geoids = tracts_gdf['GEOID'].to_numpy()
+    tract_parts, part_tract = shapely.get_parts(tracts_gdf.geometry.values, return_index=True)
+    outlines = [np.asarray(part.exterior.coords) for part in tract_parts]
+
+    # Same aspect correction GeoPandas applies when plotting geographic (lon/lat) coordinates
+    miny, maxy = tracts_gdf.total_bounds[[1, 3]]
+    aspect = 1 / np.cos(np.deg2rad((miny + maxy) / 2))
+
+    # Align each year's incomes with the tract outlines; tracts without a value become NaN.
+    # Only these small per-year arrays are sent to the workers, not the GeoDataFrame
+    year_incomes = {
+        year: (
+            gdf_year.set_index('GEOID')['Median_Household_Income']
+            .reindex(tract_geoids)
+            .to_numpy(dtype=float, na_value=np.nan)[part_tract]
+        )
+        for year, gdf_year in merged_gdf.groupby('Year', sort=True)
+    }
+
+    # The years are independent, so they are rendered in parallel
+    # (processes rather than threads, as matplotlib rendering is not thread-safe)
+    with ProcessPoolExecutor(
+        max_workers=min(len(year_incomes), os.cpu_count() or 1),
+        initializer=init_worker,
+        initargs=(outlines, aspect)
+    ) as executor:
+        for output_filename in executor.map(render_year, year_incomes.keys(), year_incomes.values()):
+            print(f"  Map saved as: {output_filename}")
+
+    print("\nAll maps have been generated!")
+
+
+if __name__ == '__main__':
+    main()
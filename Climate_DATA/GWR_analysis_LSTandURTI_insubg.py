@@ -1,9 +1,52 @@
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
+from numba import njit, prange
 from sklearn.preprocessing import StandardScaler
 from mgwr.gwr import GWR
-from mgwr.sel_bw import Sel_BW
+from mgwr.search import golden_section
+
+# Read the tract shapefile through pyogrio's Arrow path when available (Fiona otherwise)
+try:
+    import pyogrio
+    SHP_READ_KWARGS = {'engine': 'pyogrio', 'use_arrow': True}
+except ImportError:
+    SHP_READ_KWARGS = {}
+
+# Every local regression of a GWR fit at one bandwidth, compiled and run in parallel over observations.
+# Mirrors mgwr's Gaussian GWR with an adaptive bisquare kernel: the bandwidth is the distance to the
+# bw-th nearest neighbour, and influ is the diagonal of the hat matrix
+@njit(parallel=True, cache=True)
+def local_wls(coords, X, y, bw):
+    n, k = X.shape
+    params = np.empty((n, k))
+    predy = np.empty(n)
+    influ = np.empty(n)
+    for i in prange(n):
+        dist = np.sqrt((coords[:, 0] - coords[i, 0]) ** 2 + (coords[:, 1] - coords[i, 1]) ** 2)
+        bandwidth = np.partition(dist, bw - 1)[bw - 1] * 1.0000001
+        wi = (1.0 - (dist / bandwidth) ** 2) ** 2
+        wi[dist >= bandwidth] = 0.0
+
+        xtw = X.T * wi
+        xtwx = xtw @ X
+        betas = np.linalg.solve(xtwx, xtw @ y)
+        params[i] = betas
+        predy[i] = X[i] @ betas
+        influ[i] = X[i] @ np.linalg.solve(xtwx, X[i]) * wi[i]
+    return params, predy, influ
+
+
+# AICc of a Gaussian GWR at an (integer) adaptive bandwidth, as computed by mgwr's get_AICc
+def gwr_aicc(bw, coords, X, y):
+    _, predy, influ = local_wls(coords, X, y, int(bw))
+    n = y.shape[0]
+    tr_S = influ.sum()
+    rss = np.sum((y - predy) ** 2)
+    llf = -0.5 * n * (np.log(rss) + 1.0 + np.log(2.0 * np.pi / n))
+    return -2.0 * llf + 2.0 * n * (tr_S + 1.0) / (n - tr_S - 2.0)
+
 
 # ==============================================================================
 # Step 1: Load and prepare data
@@ -13,7 +56,7 @@ print("--- Step 1: Loading and preparing data for GWR analysis ---")
 # a) Load and merge data
 utri_df = pd.read_csv('dc_utri_analysis.csv', dtype={'GEOID': str})
 thermal_df = pd.read_csv('dc_tract_thermal_climate_2022.csv', dtype={'GEOID': str})
-tracts_gdf = gpd.read_file('tl_2022_11_tract.shp', dtype={'GEOID': str})
+tracts_gdf = gpd.read_file('tl_2022_11_tract.shp', columns=['GEOID', 'geometry'], **SHP_READ_KWARGS)
 
 merged_df = pd.merge(utri_df, thermal_df[['GEOID', 'LST_C_mean']], on='GEOID', how='inner')
 gdf_analysis = tracts_gdf.merge(merged_df, on='GEOID', how='inner')
@@ -26,7 +69,11 @@ gdf_clean = gdf_analysis[cols_for_model + ['geometry']].dropna().copy()
 print(f"Data preparation complete. {len(gdf_clean)} valid census tracts are included in the model.")
 
 # c) Extract coordinates, dependent variable, and independent variables
-coords = list(zip(gdf_clean['geometry'].centroid.x, gdf_clean['geometry'].centroid.y))
+# Project once to a metric CRS (NAD83 / Maryland, which covers D.C.) so the centroids and the
+# GWR distance calculations are in metres rather than degrees
+gdf_clean = gdf_clean.to_crs('EPSG:26985')
+centroids = gdf_clean.geometry.centroid
+coords = np.column_stack([centroids.x.to_numpy(), centroids.y.to_numpy()])
 y = gdf_clean['LST_C_mean'].values.reshape(-1, 1)
 X = gdf_clean[['global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness']].values
 
@@ -42,8 +89,17 @@ X_std = scaler_X.fit_transform(X)
 print("\n--- Step 2: Finding the optimal bandwidth for the GWR model... ---")
 # We use the 'Golden Section' search method and the AICc criterion to automatically find the best bandwidth.
 # The bandwidth represents the number of neighbors used to calculate each local model.
-selector = Sel_BW(coords, y_std, X_std, fixed=False, kernel='bisquare')
-best_bandwidth = selector.search(criterion='AICc')
+# This is the same search Sel_BW(fixed=False, kernel='bisquare').search(criterion='AICc') runs, but each
+# candidate bandwidth is scored with the compiled local_wls kernel instead of a full mgwr fit.
+# mgwr adds the intercept column itself; the kernel wants a C-contiguous design matrix
+X_design = np.ascontiguousarray(np.hstack([np.ones((X_std.shape[0], 1)), X_std]))
+y_vec = y_std.ravel()
+bw_min = 40 + 2 * X_design.shape[1]  # Sel_BW's initial search section for adaptive bandwidths
+bw_max = X_design.shape[0]
+best_bandwidth, _, _ = golden_section(
+    bw_min, bw_max, 0.38197, lambda bw: gwr_aicc(bw, coords, X_design, y_vec),
+    tol=1.0e-6, max_iter=200, bw_max=None, int_score=True
+)
 print(f"Optimal bandwidth found: {best_bandwidth} neighbors")
 
 # ==============================================================================
@@ -62,26 +62,23 @@ except Exception as e:
     print(f"Error: Could not load the Shapefile 'tl_2022_11_tract.shp'. Error: {e}")
     exit()
 
-# b) Define a function to mask clouds in Landsat imagery
-def cloud_mask_landsat(image):
-    # Use the QA band to identify and mask clouds
+# b) Define a function that masks clouds and converts the thermal band to LST in one pass
+def masked_lst(image):
+    # Use the QA band to identify clouds (bit 3) and cloud shadows (bit 4)
     qa = image.select('QA_PIXEL')
-    cloud_mask = qa.bitwiseAnd(1 << 3).Or(qa.bitwiseAnd(1 << 4))
-    return image.updateMask(cloud_mask.Not())
+    clear = qa.bitwiseAnd(1 << 3).Or(qa.bitwiseAnd(1 << 4)).Not()
+    # Select the thermal band (ST_B10), apply the scaling factor, and convert to Celsius
+    lst = image.select('ST_B10').multiply(0.00341802).add(149.0 - 273.15)
+    return lst.updateMask(clear).copyProperties(image, ['system:time_start'])
 
 # c) GEE image processing workflow
 # Use Landsat 9 Collection 2, Tier 1 Land Surface Temperature product
-lst_collection = ee.ImageCollection('LANDSAT/LC09/C02/T1_L2') \
+# Heavily overcast scenes (scene-level CLOUD_COVER of 20% or more) are dropped before any per-pixel work
+lst_processed = ee.ImageCollection('LANDSAT/LC09/C02/T1_L2') \
     .filterDate('2022-06-01', '2022-08-31') \
     .filterBounds(tracts_ee.geometry()) \
-    .map(cloud_mask_landsat)
-
-# Select the thermal band (ST_B10), apply the scaling factor, and convert to Celsius
-def process_lst(image):
-    lst = image.select('ST_B10').multiply(0.00341802).add(149.0).subtract(273.15)
-    return lst.copyProperties(image, ['system:time_start'])
-
-lst_processed = lst_collection.map(process_lst)
+    .filter(ee.Filter.lt('CLOUD_COVER', 20)) \
+    .map(masked_lst)
 
 # Calculate the average land surface temperature for the summer
 mean_lst_image = lst_processed.mean()
@@ -93,9 +90,12 @@ lst_per_tract = mean_lst_image.reduceRegions(
     scale=30  # Resolution of Landsat's thermal band
 ).select(['GEOID', 'mean'], ['GEOID', 'LST_C'])
 
-# e) Convert the GEE results back to a GeoDataFrame
+# e) Download the GEE results as a single CSV
+# Only the GEOID join key and LST are needed, so skip the per-feature getInfo() decoding of
+# ee_to_geopandas and fetch the table in one bulk HTTPS transfer instead
 try:
-    lst_gdf = geemap.ee_to_geopandas(lst_per_tract)
+    lst_url = lst_per_tract.getDownloadURL(filetype='CSV', selectors=['GEOID', 'LST_C'])
+    lst_df = pd.read_csv(lst_url, dtype={'GEOID': str})
     print("Land Surface Temperature data processed and downloaded successfully.")
 except Exception as e:
     print(f"Failed to convert data from GEE. This could be due to a network issue or a GEE processing timeout. Error: {e}")
@@ -106,7 +106,7 @@ except Exception as e:
 # ==============================================================================
 print("\n--- Step 4: Consolidating all data and exporting to a CSV file ---")
 
-lst_final_df = lst_gdf[['GEOID', 'LST_C']].copy()
+lst_final_df = lst_df[['GEOID', 'LST_C']].copy()
 
 # Add the previously calculated weather station data as new columns
 lst_final_df['Avg_Temp_C'] = avg_temp_c
@@ -1,3 +1,4 @@
+import pickle
 import osmnx as ox
 import matplotlib.pyplot as plt
 
@@ -53,14 +54,22 @@ print(f"  - Number of edges (streets): {len(G.edges)}")
 # 4. Save Road Network Data to a Local File
 # ==============================================================================
 
-# Save the downloaded data as a .graphml file, which is a standard format for graph data. 
+# Save the downloaded data as a binary pickle of the NetworkX graph. Unlike GraphML, which writes every
+# attribute as an XML string that has to be re-parsed on load, pickle keeps the attribute types and is much faster to read back.
 # This way, you can load it directly from your local machine next time without needing to download it again.
-output_filename = "dc_road_network.graphml"
-ox.save_graphml(G, filepath=output_filename)
+output_filename = "dc_road_network.pkl"
+with open(output_filename, 'wb') as f:
+    pickle.dump(G, f, protocol=5)
 
 print(f"\nThe road network has been successfully saved to the file: '{output_filename}'")
 print("Next time, you can use the following code to load it directly:")
-print(f"G_loaded = ox.load_graphml('{output_filename}')")
+print(f"with open('{output_filename}', 'rb') as f: G_loaded = pickle.load(f)")
+
+# Set to True to also export the standard .graphml file for use in other GIS/graph tools
+SAVE_GRAPHML = False
+if SAVE_GRAPHML:
+    ox.save_graphml(G, filepath="dc_road_network.graphml")
+    print("GraphML copy saved to: 'dc_road_network.graphml'")
 
 
 # ==============================================================================
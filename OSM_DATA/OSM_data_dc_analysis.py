@@ -1,17 +1,22 @@
+import pickle
 import osmnx as ox
 import pandas as pd
 import geopandas as gpd
+import numpy as np
+import shapely
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 print("--- Step 1: Load and Convert Road Network Data ---")
 
-graphml_file = 'dc_road_network.graphml'
+graph_file = 'dc_road_network.pkl'
 
 try:
-    G = ox.load_graphml(graphml_file)
-    print(f"Successfully loaded '{graphml_file}'.")
+    with open(graph_file, 'rb') as f:
+        G = pickle.load(f)
+    print(f"Successfully loaded '{graph_file}'.")
 except FileNotFoundError:
-    print(f"Error: File '{graphml_file}' not found. Please ensure it is in the same folder as the script.")
+    print(f"Error: File '{graph_file}' not found. Please ensure it is in the same folder as the script.")
     exit()
 
 # OSMnx converts the graph's edges into a GeoDataFrame
@@ -49,8 +54,12 @@ if 'name' in df_clean.columns:
 
 # b. Clean the 'highway' column: Sometimes it's a list, so we'll take only the first primary type
 #    e.g., ['primary', 'secondary'] -> 'primary'
+#    Only the (few) list entries are touched; all other values are kept as they are
 if 'highway' in df_clean.columns:
-    df_clean['highway'] = df_clean['highway'].apply(lambda x: x[0] if isinstance(x, list) else x)
+    highway_values = df_clean['highway'].to_numpy(dtype=object, copy=True)
+    is_list = np.fromiter((isinstance(x, list) for x in highway_values), dtype=bool, count=len(highway_values))
+    highway_values[is_list] = [x[0] for x in highway_values[is_list]]
+    df_clean['highway'] = highway_values
 
 # c. Convert boolean values to more readable strings
 if 'oneway' in df_clean.columns:
@@ -68,18 +77,26 @@ print(df_clean.head())
 
 print("\n--- Step 3: Save as a .csv file ---")
 
-# Create a copy for CSV export and convert geometry to WKT (Well-Known Text)
-df_for_csv = df_clean.copy()
-df_for_csv['geometry_wkt'] = df_for_csv['geometry'].apply(lambda geom: geom.wkt)
-
-# Drop the original geometry column as it's not CSV-friendly
-df_for_csv = df_for_csv.drop(columns=['geometry'])
+# Build the CSV frame without copying df_clean first: drop the original geometry column as it's not
+# CSV-friendly and append it as WKT (Well-Known Text), converted in one vectorized call at full coordinate precision
+df_for_csv = df_clean.drop(columns=['geometry']).assign(
+    geometry_wkt=shapely.to_wkt(df_clean.geometry.values, rounding_precision=-1)
+)
 
+# Write in chunks so the formatted text of the whole table is never held in memory at once
 output_csv_file = 'dc_road_network_clean.csv'
-df_for_csv.to_csv(output_csv_file, index=False)
+df_for_csv.to_csv(output_csv_file, index=False, chunksize=100_000)
 
 print(f"Cleaned road network data has been successfully saved to: '{output_csv_file}'")
 
+# Also save it as GeoParquet, which the combined analysis loads without any WKT parsing
+# Columns like 'osmid' or 'maxspeed' mix single values and lists; they are stored as text, the same as in the CSV
+df_for_parquet = df_clean.astype({col: 'string' for col in df_clean.columns if col != 'geometry' and df_clean[col].dtype == object})
+output_parquet_file = 'dc_road_network_clean.parquet'
+df_for_parquet.to_parquet(output_parquet_file, index=False)
+
+print(f"GeoParquet copy saved to: '{output_parquet_file}'")
+
 # Keep the GeoDataFrame for visualization
 road_network_gdf = df_clean
 
@@ -89,7 +106,9 @@ print("\n--- Step 4: Visualize the Cleaned Road Network Data ---")
 print("Generating a visualization map based on road types...")
 
 # 1. Identify road types and assign colors and line widths to them
-road_types = road_network_gdf['highway'].value_counts().head(10)
+# Edge count per road type, in a single pass over the column; also used to build the legend below
+highway_counts = road_network_gdf['highway'].value_counts()
+road_types = highway_counts.head(10)
 print("\nMain road types in the data:")
 print(road_types)
 
@@ -115,21 +134,32 @@ fig, ax = plt.subplots(figsize=(15, 15))
 ax.set_facecolor('white')
 fig.patch.set_facecolor('white')
 
-# 3. Loop through each road type and plot it according to the defined style
-# We sort by zorder from high to low to ensure that main roads are drawn on top
+# 3. Draw every road in a single LineCollection, styled per road type
+# We sort by zorder so that main roads are drawn on top; roads of the same zorder keep the style_map
+# order (high to low), and all other unclassified roads (default style, zorder 0) are drawn after
+# footway/path and beneath all higher-zorder types
 sorted_types = sorted(style_map.keys(), key=lambda k: style_map[k]['zorder'], reverse=True)
 
-for road_type in sorted_types:
-    if road_type in road_network_gdf['highway'].values:
-        gdf_subset = road_network_gdf[road_network_gdf['highway'] == road_type]
-        if not gdf_subset.empty:
-            style = style_map[road_type]
-            gdf_subset.plot(ax=ax, color=style['color'], linewidth=style['linewidth'], zorder=style['zorder'])
+highway = road_network_gdf['highway']
+edge_styles = pd.DataFrame.from_dict(style_map, orient='index').reindex(highway).fillna(default_style)
+type_rank = pd.Series(range(len(sorted_types)), index=sorted_types).reindex(highway).fillna(len(sorted_types))
+draw_order = np.lexsort((type_rank.to_numpy(), edge_styles['zorder'].to_numpy()))
+
+# Split (multi)line geometries into one vertex array per line part
+parts, part_edge = shapely.get_parts(road_network_gdf.geometry.values[draw_order], return_index=True)
+coords, coord_part = shapely.get_coordinates(parts, return_index=True)
+segments = np.split(coords, np.flatnonzero(np.diff(coord_part)) + 1)
+
+part_styles = edge_styles.iloc[draw_order[part_edge]]
+roads_lc = LineCollection(
+    segments, colors=part_styles['color'].to_list(), linewidths=part_styles['linewidth'].to_numpy()
+)
+ax.add_collection(roads_lc)
+ax.autoscale_view()
 
-# Plot all other unclassified roads
-other_roads = road_network_gdf[~road_network_gdf['highway'].isin(style_map.keys())]
-if not other_roads.empty:
-    other_roads.plot(ax=ax, **default_style)
+# Same aspect correction GeoPandas applies when plotting geographic (lon/lat) coordinates
+miny, maxy = road_network_gdf.total_bounds[[1, 3]]
+ax.set_aspect(1 / np.cos(np.deg2rad((miny + maxy) / 2)))
 
 # 4. Beautify the map
 # ax.set_title('Washington D.C. Road Network by Type', fontsize=20, color='black')
@@ -148,13 +178,11 @@ from matplotlib.lines import Line2D
 # Only create legend items for road types that actually exist in the data
 legend_elements = []
 for road_type, style in style_map.items():
-    if road_type in road_network_gdf['highway'].values:
-        gdf_subset = road_network_gdf[road_network_gdf['highway'] == road_type]
-        if not gdf_subset.empty:
-            label = road_type.replace('_', ' ').title()
-            legend_elements.append(
-                Line2D([0], [0], color=style['color'], lw=style['linewidth'], label=label)
-            )
+    if road_type in highway_counts.index:
+        label = road_type.replace('_', ' ').title()
+        legend_elements.append(
+            Line2D([0], [0], color=style['color'], lw=style['linewidth'], label=label)
+        )
 
 # Add the legend
 legend = ax.legend(
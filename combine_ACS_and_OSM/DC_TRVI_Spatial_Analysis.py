@@ -7,8 +7,11 @@ import seaborn as sns
 from tqdm import tqdm
 from shapely import wkt
 
+from utri_data import load_clean_utri
+
+# Tracts with all four UTRI metrics and income (cleaned once and cached as 'dc_utri_analysis_clean.parquet')
 try:
-    df = pd.read_csv('dc_utri_analysis.csv')
+    df_clean = load_clean_utri()
 except FileNotFoundError:
     print("Error: 'dc_utri_analysis.csv' file not found.")
     exit()
@@ -16,9 +19,6 @@ except FileNotFoundError:
 # ==============================================================================
 # Basic Statistics and Distribution Plots of Metrics
 # ==============================================================================
-# Clean the data
-df_clean = df.dropna(subset=['global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness', 'Median_Household_Income'])
-
 print("--- 1. Basic Statistical Analysis of UTRI Metrics and Income ---")
 print(df_clean[['Median_Household_Income', 'global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness']].describe())
 
@@ -38,37 +38,38 @@ plt.close(fig)
 # ==============================================================================
 # Construct and Analyze the "Thermal Resilience Vulnerability Index" (TRVI)
 # ==============================================================================
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from sklearn.preprocessing import StandardScaler
 
 print("\n--- 2. Construct and Analyze the 'Thermal Resilience Vulnerability Index' (TRVI) ---")
 
 # --- a) Prepare the data ---
 indicator_cols = ['global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness']
-cols_for_analysis = ['Median_Household_Income'] + indicator_cols
-df_analysis_subset = df_clean[cols_for_analysis].copy()
+# The indicators are processed as one contiguous float64 array (one column per indicator, in this order);
+# only the resulting indices are attached back to df_clean
+df_processed = df_clean[indicator_cols].to_numpy(dtype=np.float64, copy=True)
 
 
 # --- b) Use the Entropy Weight Method (EWM) to calculate the weights of the four physical indicators ---
 print("Calculating weights for physical road network indicators using the Entropy Weight Method...")
 
 # 1. Data direction alignment and normalization
-df_processed = df_analysis_subset[indicator_cols].copy()
-scaler_minmax = MinMaxScaler()
+# Min-max scale all four indicators in one pass (a constant column maps to 0, as with MinMaxScaler)
+mn, mx = df_processed.min(axis=0), df_processed.max(axis=0)
+df_processed = (df_processed - mn) / np.where(mx == mn, 1.0, mx - mn)
 
 # Higher permeability is better (positive indicator)
-df_processed['global_permeability'] = scaler_minmax.fit_transform(df_processed[['global_permeability']])
-# Lower clustering is better (negative indicator) -> 1 - normalized value
-df_processed['avg_clustering_coeff'] = 1 - scaler_minmax.fit_transform(df_processed[['avg_clustering_coeff']])
-# Lower assortativity is better (negative indicator)
-df_processed['degree_assortativity'] = 1 - scaler_minmax.fit_transform(df_processed[['degree_assortativity']])
-# Lower Gini (less inequality) is better (negative indicator)
-df_processed['gini_edge_betweenness'] = 1 - scaler_minmax.fit_transform(df_processed[['gini_edge_betweenness']])
+# Lower clustering, lower assortativity and lower Gini (less inequality) are better (negative indicators)
+# -> 1 - normalized value
+df_processed[:, 1:] = 1.0 - df_processed[:, 1:]
 
 # 2. Calculate information entropy and weights
-m, n = df_processed.shape[0], len(indicator_cols)
+m, n = df_processed.shape
 k = 1 / np.log(m)
-entropy = [-k * ( (df_processed[col] / df_processed[col].sum()) * np.log(df_processed[col] / df_processed[col].sum()).replace([np.inf, -np.inf], 0) ).sum() for col in indicator_cols]
-d = 1 - np.array(entropy)
+# All indicators at once: P holds each tract's share of the column total, and p * log(p) is taken as 0 where p = 0
+P = df_processed / df_processed.sum(axis=0, keepdims=True)
+logP = np.log(P, out=np.zeros_like(P), where=P > 0)
+entropy = -k * (P * logP).sum(axis=0)
+d = 1 - entropy
 weights_ewm = d / d.sum()
 w_physical = dict(zip(indicator_cols, weights_ewm))
 
@@ -79,12 +80,7 @@ for indicator, weight in w_physical.items():
 
 # --- c) Calculate an entropy-weighted UTRI index ---
 # This index represents "built environment sensitivity"
-df_analysis_subset['UTRI_physical'] = (
-    w_physical['global_permeability'] * df_processed['global_permeability'] +
-    w_physical['avg_clustering_coeff'] * df_processed['avg_clustering_coeff'] +
-    w_physical['degree_assortativity'] * df_processed['degree_assortativity'] +
-    w_physical['gini_edge_betweenness'] * df_processed['gini_edge_betweenness']
-)
+df_clean.loc[:, 'UTRI_physical'] = (df_processed * weights_ewm).sum(axis=1)
 
 
 # --- d) Construct the final TRVI ---
@@ -92,21 +88,17 @@ print("\nConstructing the final TRVI...")
 
 # 1. Standardize MHI and the purely physical UTRI using Z-scores
 scaler_z = StandardScaler()
-scaled_data = scaler_z.fit_transform(df_analysis_subset[['Median_Household_Income', 'UTRI_physical']])
-df_scaled = pd.DataFrame(scaled_data, columns=['MHI_Z', 'UTRI_physical_Z'], index=df_analysis_subset.index)
+mhi_z, utri_physical_z = scaler_z.fit_transform(df_clean[['Median_Household_Income', 'UTRI_physical']]).T
 
 # 2. Unify direction and perform linear summation for vulnerability
-df_scaled['TRVI'] = (
-    -df_scaled['MHI_Z'] +          # Lower income, more vulnerable
-    -df_scaled['UTRI_physical_Z']  # Lower physical resilience, more vulnerable
+df_clean.loc[:, 'TRVI'] = (
+    -mhi_z +           # Lower income, more vulnerable
+    -utri_physical_z   # Lower physical resilience, more vulnerable
 )
 
-# --- e) Merge the TRVI index back into the main DataFrame ---
-df_final = df_clean.join(df_scaled[['TRVI']])
-
 
 # Find the 10 least vulnerable (most resilient) census tracts
-most_resilient = df_final.nsmallest(10, 'TRVI')
+most_resilient = df_clean.nsmallest(10, 'TRVI')
 print("\nTop 10 census tracts with the lowest 'Thermal Resilience Vulnerability' (most resilient):")
 print(most_resilient[['GEOID', 'Tract_Name', 'Median_Household_Income', 'TRVI']])
 
@@ -114,7 +106,6 @@ print(most_resilient[['GEOID', 'Tract_Name', 'Median_Household_Income', 'TRVI']]
 # TRVI Index and Spatial Distribution Map
 # ==============================================================================
 import geopandas as gpd
-from esda.moran import Moran
 from libpysal.weights import Queen
 
 print("\n--- 4. Analyze the spatial distribution characteristics of the indicators (Global Moran's I) ---")
@@ -122,27 +113,51 @@ print("\n--- 4. Analyze the spatial distribution characteristics of the indicato
 gdf_tracts = gpd.read_file('tl_2022_11_tract.shp')
 
 print(f"Before merging: The type of 'GEOID' in the Shapefile is {gdf_tracts['GEOID'].dtype}")
-print(f"Before merging: The type of 'GEOID' in df_final is {df_final['GEOID'].dtype}")
+print(f"Before merging: The type of 'GEOID' in df_clean is {df_clean['GEOID'].dtype}")
 
 gdf_tracts['GEOID'] = gdf_tracts['GEOID'].astype(str)
-df_final['GEOID'] = df_final['GEOID'].astype(str)
+df_clean['GEOID'] = df_clean['GEOID'].astype(str)
 
 print(f"After merging: The type of 'GEOID' in the Shapefile is {gdf_tracts['GEOID'].dtype}")
-print(f"After merging: The type of 'GEOID' in df_final is {df_final['GEOID'].dtype}")
+print(f"After merging: The type of 'GEOID' in df_clean is {df_clean['GEOID'].dtype}")
 
-gdf_analysis = gdf_tracts.merge(df_final, on='GEOID', how='inner')
+gdf_analysis = gdf_tracts.merge(df_clean, on='GEOID', how='inner')
 
 weights = Queen.from_dataframe(gdf_analysis, use_index=True)
 weights.transform = 'r' # Row-standardized
 
 # Calculate Moran's I for each indicator
-moran_results = {}
+moran_cols = []
 for col in ['Median_Household_Income', 'global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness', 'TRVI']:
     if gdf_analysis[col].isnull().any():
         print(f"Warning: NaN values found in column '{col}', skipping Moran's I calculation.")
         continue
-    moran = Moran(gdf_analysis[col], weights)
-    moran_results[col] = {'Moran_I': moran.I, 'p_value': moran.p_sim}
+    moran_cols.append(col)
+
+# All indicators are evaluated together against the sparse weights matrix: I = n / S0 * z'Wz / z'z for
+# each (mean-centred) column, as in esda's Moran. The pseudo p-values use one shared set of 999 random
+# permutations of the tracts for every indicator (same folded p_sim definition as esda)
+permutations = 999
+W_sparse = weights.sparse.tocsr()
+n_obs, s0 = W_sparse.shape[0], weights.s0
+
+Z = gdf_analysis[moran_cols].to_numpy(dtype=np.float64)
+Z = Z - Z.mean(axis=0)
+z2ss = (Z * Z).sum(axis=0)
+moran_I = n_obs / s0 * (Z * (W_sparse @ Z)).sum(axis=0) / z2ss
+
+# Every permutation of every indicator as one (n_obs, permutations * n_indicators) matrix -> one sparse product
+perm_order = np.random.rand(permutations, n_obs).argsort(axis=1)
+Z_perm = Z[perm_order].transpose(1, 0, 2).reshape(n_obs, -1)
+moran_sim = (n_obs / s0 * (Z_perm * (W_sparse @ Z_perm)).sum(axis=0)).reshape(permutations, -1) / z2ss
+
+larger = (moran_sim >= moran_I).sum(axis=0)
+larger = np.minimum(larger, permutations - larger)
+p_sim = (larger + 1.0) / (permutations + 1.0)
+
+moran_results = {
+    col: {'Moran_I': moran_I[j], 'p_value': p_sim[j]} for j, col in enumerate(moran_cols)
+}
 
 print("\nGlobal Moran's I for each indicator:")
 for var, result in moran_results.items():
@@ -4,11 +4,16 @@ import osmnx as ox
 import networkx as nx
 import matplotlib.pyplot as plt
 import seaborn as sns
+from matplotlib.colors import to_rgba
+from scipy.stats import gaussian_kde
 from tqdm import tqdm
 from shapely import wkt
 
+from utri_data import load_clean_utri
+
+# Tracts with all four UTRI metrics and income (cleaned once and cached as 'dc_utri_analysis_clean.parquet')
 try:
-    df = pd.read_csv('dc_utri_analysis.csv')
+    df_clean = load_clean_utri()
 except FileNotFoundError:
     print("Error: 'dc_utri_analysis.csv' file not found.")
     exit()
@@ -16,9 +21,6 @@ except FileNotFoundError:
 # ==============================================================================
 # Basic Statistics and Distribution Plots of Metrics
 # ==============================================================================
-# Data Cleaning
-df_clean = df.dropna(subset=['global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness', 'Median_Household_Income'])
-
 print("--- 1. Basic Statistical Analysis of UTRI Metrics and Income ---")
 print(df_clean[['Median_Household_Income', 'global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness']].describe())
 
@@ -35,12 +37,28 @@ plt.rcParams['font.family'] = 'DejaVu Sans'
 plt.rcParams['axes.titleweight'] = 'bold'
 plt.rcParams['axes.labelweight'] = 'bold'
 
+# Histogram with a KDE curve, drawn straight from np.histogram and one
+# gaussian_kde evaluation instead of going through sns.histplot(kde=True).
+# Bins ('auto'), Scott bandwidth, the 200-point grid over the data range and
+# the count scaling all match what histplot draws.
+def hist_with_kde(ax, values, color, alpha=0.8, edgecolor='white', linewidth=0.8):
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values, bins='auto')
+    widths = np.diff(edges)
+    ax.bar(edges[:-1], counts, widths, align='edge', facecolor=to_rgba(color, alpha),
+           edgecolor=edgecolor, linewidth=linewidth)
+
+    # The KDE is undefined for a single value or a constant column
+    if len(values) > 1 and values.var() > 0:
+        grid = np.linspace(values.min(), values.max(), 200)
+        density = gaussian_kde(values)(grid) * (counts * widths).sum()
+        ax.plot(grid, density, color=color)
+
 # -------------------------------------------------------
 
 # First Metric: Global Permeability
 ax1 = axes[0, 0]
-sns.histplot(df_clean['global_permeability'], kde=True, ax=ax1,
-             color=colors[0], alpha=0.8, edgecolor='white', linewidth=0.8)
+hist_with_kde(ax1, df_clean['global_permeability'], color=colors[0])
 ax1.set_title('(a) Global Permeability', fontsize=13, fontweight='bold', pad=12)
 ax1.set_xlabel('Permeability Value', fontsize=11)
 ax1.set_ylabel('Frequency', fontsize=11)
@@ -52,8 +70,7 @@ ax1.legend(loc='upper right', fontsize=9, framealpha=0.9)
 
 # Second Metric: Avg. Clustering Coeff.
 ax2 = axes[0, 1]
-sns.histplot(df_clean['avg_clustering_coeff'], kde=True, ax=ax2,
-             color=colors[1], alpha=0.8, edgecolor='white', linewidth=0.8)
+hist_with_kde(ax2, df_clean['avg_clustering_coeff'], color=colors[1])
 ax2.set_title('(b) Average Clustering Coefficient', fontsize=13, fontweight='bold', pad=12)
 ax2.set_xlabel('Clustering Coefficient', fontsize=11)
 ax2.set_ylabel('Frequency', fontsize=11)
@@ -65,8 +82,7 @@ ax2.legend(loc='upper right', fontsize=9, framealpha=0.9)
 
 # Third Metric: Degree Assortativity
 ax3 = axes[1, 0]
-sns.histplot(df_clean['degree_assortativity'], kde=True, ax=ax3,
-             color=colors[2], alpha=0.8, edgecolor='white', linewidth=0.8)
+hist_with_kde(ax3, df_clean['degree_assortativity'], color=colors[2])
 ax3.set_title('(c) Degree Assortativity', fontsize=13, fontweight='bold', pad=12)
 ax3.set_xlabel('Assortativity Coefficient', fontsize=11)
 ax3.set_ylabel('Frequency', fontsize=11)
@@ -78,8 +94,7 @@ ax3.legend(loc='upper right', fontsize=9, framealpha=0.9)
 
 # Fourth Metric: Gini (Edge Betweenness)
 ax4 = axes[1, 1]
-sns.histplot(df_clean['gini_edge_betweenness'], kde=True, ax=ax4,
-             color=colors[3], alpha=0.8, edgecolor='white', linewidth=0.8)
+hist_with_kde(ax4, df_clean['gini_edge_betweenness'], color=colors[3])
 ax4.set_title('(d) Gini Coefficient of Edge Betweenness', fontsize=13, fontweight='bold', pad=12)
 ax4.set_xlabel('Gini Coefficient', fontsize=11)
 ax4.set_ylabel('Frequency', fontsize=11)
@@ -1,16 +1,35 @@
+import argparse
+import hashlib
+import os
+import pickle
+from pathlib import Path
 import pandas as pd
 import geopandas as gpd
 import osmnx as ox
 import networkx as nx
+import igraph as ig
 import numpy as np
+from numba import njit
+import shapely
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 from tqdm import tqdm
-from shapely import wkt # To convert WKT text back to geometry objects
+from joblib import Parallel, delayed
+
+# Global efficiency and edge betweenness need shortest paths from every node, which dominates the runtime on
+# large tracts. Tracts with more than SAMPLING_MIN_NODES nodes therefore use SAMPLED_SOURCES random source
+# nodes instead; pass --exact to compute both metrics from all nodes (the original values)
+SAMPLING_MIN_NODES = 200
+SAMPLED_SOURCES = 100
+
+parser = argparse.ArgumentParser(description="Clip the D.C. road network by census tract and compute the UTRI metrics.")
+parser.add_argument('--exact', action='store_true', help="compute global efficiency and edge betweenness from all nodes for every tract")
+args = parser.parse_args()
 
 # ==============================================================================
-# Step 1: Load all pre-processed data from CSV
+# Step 1: Load all pre-processed data from CSV / GeoParquet
 # ==============================================================================
-print("--- Step 1 (Optimized): Load all pre-processed data from CSV ---")
+print("--- Step 1 (Optimized): Load all pre-processed data from CSV / GeoParquet ---")
 
 # a) Load cleaned income data
 try:
@@ -22,18 +41,12 @@ except FileNotFoundError:
     print("Error: 'dc_tract_median_income_2018-2022_clean.csv' not found.")
     exit()
 
-# b) Load cleaned road network data and restore its geographic properties
+# b) Load cleaned road network data (GeoParquet keeps the geometries and their CRS, so nothing needs re-parsing)
 try:
-    road_df = pd.read_csv('dc_road_network_clean.csv')
-    # Crucial step: Convert the WKT text column back to 'geometry' objects, making it a GeoDataFrame
-    road_df['geometry'] = road_df['geometry_wkt'].apply(wkt.loads)
-    road_network_gdf = gpd.GeoDataFrame(road_df, geometry='geometry')
-    print("Road network data CSV loaded and converted to GeoDataFrame successfully.")
+    road_network_gdf = gpd.read_parquet('dc_road_network_clean.parquet')
+    print("Road network GeoParquet loaded successfully.")
 except FileNotFoundError:
-    print("Error: 'dc_road_network_clean.csv' not found.")
-    exit()
-except Exception as e:
-    print(f"Error while converting road network data: {e}")
+    print("Error: 'dc_road_network_clean.parquet' not found.")
     exit()
 
 # c) Load geographic boundaries (Shapefile) for spatial clipping
@@ -45,11 +58,12 @@ except Exception as e:
     print(f"Error: Could not load Shapefile 'tl_2022_11_tract.shp'. Error: {e}")
     exit()
     
-# d) Load original road network graph (.graphml) - the graph object is still needed for calculating metrics
+# d) Load original road network graph (pickled by OSM_data_dc.py) - the graph object is still needed for calculating metrics
 try:
-    G = ox.load_graphml('dc_road_network.graphml')
+    with open('dc_road_network.pkl', 'rb') as f:
+        G = pickle.load(f)
 except FileNotFoundError:
-    print("Error: 'dc_road_network.graphml' not found.")
+    print("Error: 'dc_road_network.pkl' not found.")
     exit()
 
 # ==============================================================================
@@ -62,9 +76,6 @@ tracts_with_income_gdf = tracts_gdf.merge(income_2022_df, on='GEOID', how='left'
 tracts_with_income_gdf['Median_Household_Income'] = tracts_with_income_gdf['Median_Household_Income'].replace(-666666666, np.nan)
 
 # b) Unify Coordinate Reference System (CRS)
-# OSMnx defaults to 'epsg:4326' (WGS84)
-road_network_gdf.set_crs('epsg:4326', inplace=True)
-
 # Convert all layers to a projected CRS consistent with the census tract layer to ensure spatial operation accuracy
 target_crs = tracts_with_income_gdf.crs
 print(f"Target CRS is: {target_crs}")
@@ -84,8 +95,12 @@ fig, ax = plt.subplots(figsize=(15, 15))
 # Plot basemap: Census tracts colored by median income
 tracts_with_income_gdf.plot(column='Median_Household_Income', cmap='plasma', linewidth=0.5, ax=ax, edgecolor='0.5', legend=True, legend_kwds={'label': "Median Household Income ($)", 'orientation': "horizontal", 'pad': 0.01}, missing_kwds={"color": "lightgrey", "label": "Missing data"})
 
-# Overlay the road network layer
-road_network_gdf.plot(ax=ax, color='white', linewidth=0.3, alpha=0.6)
+# Overlay the road network layer as a single LineCollection (one vertex array per line part)
+road_parts = shapely.get_parts(road_network_gdf.geometry.values)
+road_coords, road_part_idx = shapely.get_coordinates(road_parts, return_index=True)
+road_segments = np.split(road_coords, np.flatnonzero(np.diff(road_part_idx)) + 1)
+ax.add_collection(LineCollection(road_segments, colors='white', linewidths=0.3, alpha=0.6))
+ax.autoscale_view()
 
 ax.set_facecolor('black')
 ax.set_axis_off()
@@ -102,71 +117,163 @@ plt.show()
 # Step 4: Road Network Clipping and UTRI Metric Calculation
 # ==============================================================================
 print("\n--- Step 4: Begin clipping the road network for each census tract and calculating UTRI metrics ---")
+if not args.exact:
+    print(f"(Tracts with more than {SAMPLING_MIN_NODES} nodes use {SAMPLED_SOURCES} sampled source nodes for efficiency and betweenness; run with --exact for exact values)")
 
-# Helper function for Gini Coefficient
+# Helper function for Gini Coefficient (compiled; x is a float64 array)
+# Sorts once, then shifts negatives and accumulates both sums in a single pass
+@njit(cache=True, fastmath=True)
 def gini_coefficient(x):
-    x = np.asarray(x, dtype=np.float64)
-    if np.amin(x) < 0: x -= np.amin(x)
-    if np.sum(x) == 0: return 0
+    n = x.shape[0]
+    if n == 0: raise ValueError("gini_coefficient() needs at least one value")
     x = np.sort(x)
-    n = len(x)
-    index = np.arange(1, n + 1)
-    return (np.sum((2 * index - n - 1) * x)) / (n * np.sum(x))
+    shift = min(x[0], 0.0)
+    total = 0.0
+    weighted = 0.0
+    for i in range(n):
+        xi = x[i] - shift
+        total += xi
+        weighted += (2 * (i + 1) - n - 1) * xi
+    if total == 0: return 0.0
+    return weighted / (n * total)
+
+# Helper function for nx.global_efficiency on an igraph graph: the mean of 1/d over ordered node pairs, with d the
+# hop distance ignoring edge direction (unreachable pairs count as 0). Given source nodes, only the pairs starting
+# at them are averaged. Distances come from igraph's C BFS, a block of sources at a time to bound memory
+def global_efficiency(ig_graph, sources=None):
+    n = ig_graph.vcount()
+    sources = list(range(n)) if sources is None else sources
+    inverse_distance_sum = 0.0
+    for start in range(0, len(sources), 256):
+        distances = np.asarray(ig_graph.distances(source=sources[start:start + 256], mode='all'), dtype=np.float64)
+        inverse_distance_sum += np.divide(1.0, distances, out=np.zeros_like(distances), where=distances > 0).sum()
+    return inverse_distance_sum / (len(sources) * (n - 1))
+
+# The four UTRI metrics of one tract's road network (the largest component, see below)
+# Runs in the worker processes, so it only receives that component, never the whole network
+def compute_tract_metrics(tract_geoid, directed_subgraph, sample_sources):
+    # Undirected (simple) version of the component, for the metrics that ignore edge direction
+    subgraph = nx.Graph(directed_subgraph)
+    
+    # igraph copy of the directed component (vertex i is the i-th node) for the two shortest-path metrics
+    node_index = {node: i for i, node in enumerate(directed_subgraph)}
+    edges, lengths = [], []
+    for u, v, length in directed_subgraph.edges(data='length', default=1):
+        edges.append((node_index[u], node_index[v]))
+        lengths.append(length)
+    ig_subgraph = ig.Graph(n=len(node_index), edges=edges, directed=True)
+    
+    # Source nodes of the shortest paths (None = all nodes), shared by both metrics
+    if sample_sources is None:
+        sources = None
+    else:
+        sources = np.random.default_rng(0).choice(len(node_index), size=sample_sources, replace=False).tolist()
+    
+    metrics = {'GEOID': tract_geoid}
+    
+    # Metric 1: Global Permeability -> Global Efficiency
+    try: metrics['global_permeability'] = global_efficiency(ig_subgraph, sources)
+    except Exception: metrics['global_permeability'] = None
+    
+    # Metric 2: Average Clustering Coefficient
+    try: metrics['avg_clustering_coeff'] = nx.average_clustering(subgraph)
+    except Exception: metrics['avg_clustering_coeff'] = None
+    
+    # Metric 3: Degree Assortativity
+    try: metrics['degree_assortativity'] = nx.degree_assortativity_coefficient(directed_subgraph)
+    except Exception: metrics['degree_assortativity'] = None
+    
+    # Metric 4: Gini Coeff of Edge Betweenness
+    #    (unnormalized; the Gini coefficient does not depend on the scale NetworkX normalizes by)
+    #    igraph rejects non-positive weights, so components with zero-length edges (e.g. duplicate-coordinate
+    #    nodes) are computed with NetworkX instead, from the same source nodes
+    try:
+        if min(lengths) > 0:
+            edge_betweenness = ig_subgraph.edge_betweenness(directed=True, weights=lengths, sources=sources)
+        else:
+            nodes = list(node_index)
+            edge_betweenness = nx.edge_betweenness_centrality_subset(
+                directed_subgraph, sources=nodes if sources is None else [nodes[i] for i in sources],
+                targets=nodes, weight='length'
+            ).values()
+        metrics['gini_edge_betweenness'] = gini_coefficient(np.fromiter(edge_betweenness, dtype=np.float64))
+    except Exception: metrics['gini_edge_betweenness'] = None
+
+    return metrics
+
+# The node -> tract assignment and the undirected network below only change when the road network or the
+# tract boundaries do, so both are cached under .cache/, keyed on the modification times of those two files
+cache_dir = Path('.cache')
+cache_key = hashlib.md5(
+    f"{os.path.getmtime('dc_road_network.pkl')}|{os.path.getmtime('tl_2022_11_tract.shp')}".encode()
+).hexdigest()[:12]
+nodes_by_tract_cache = cache_dir / f'nodes_by_tract_{cache_key}.parquet'
+g_und_cache = cache_dir / f'G_und_{cache_key}.pkl'
+cache_dir.mkdir(exist_ok=True)
+
+# Assign every node to the census tract it falls in with a single spatial join (indexed with an STRtree)
+# instead of testing all nodes against each tract polygon inside the loop
+if nodes_by_tract_cache.exists():
+    nodes_in_tracts = pd.read_parquet(nodes_by_tract_cache)
+    print(f"Node-to-tract assignment loaded from the cache '{nodes_by_tract_cache}'.")
+else:
+    nodes_in_tracts = gpd.sjoin(
+        nodes_gdf[['geometry']], tracts_with_income_gdf[['GEOID', 'geometry']], how='inner', predicate='within'
+    )[['GEOID']]
+    nodes_in_tracts.to_parquet(nodes_by_tract_cache)
+nodes_by_tract = nodes_in_tracts.groupby('GEOID').groups
+
+# Undirected (simple) version of the whole network, built once. Tract subgraphs are taken from it as
+# views to find their largest component without copying
+if g_und_cache.exists():
+    with open(g_und_cache, 'rb') as f:
+        G_und = pickle.load(f)
+else:
+    G_und = nx.Graph(G)
+    with open(g_und_cache, 'wb') as f:
+        pickle.dump(G_und, f, protocol=5)
 
 results = []
+tract_jobs = []
 
-for index, tract in tqdm(tracts_with_income_gdf.iterrows(), total=tracts_with_income_gdf.shape[0], desc="Processing Tracts"):
-    tract_geoid = tract['GEOID']
-    tract_polygon = tract['geometry']
+# Only the GEOID is needed per tract (the node assignment above already used the polygons)
+for tract_geoid in tqdm(tracts_with_income_gdf['GEOID'].to_numpy(), desc="Clipping Tracts"):
     
     # 1. Clip road network: Get all nodes that fall within this census tract
-    nodes_within_tract = nodes_gdf[nodes_gdf.within(tract_polygon)]
+    nodes_within_tract = nodes_by_tract.get(tract_geoid, [])
     
     if len(nodes_within_tract) < 3:
         results.append({'GEOID': tract_geoid, 'error': 'Not enough nodes'})
         continue
     
-    # Create a subgraph from the main graph
-    subgraph = G.subgraph(nodes_within_tract.index).copy()
+    # Create a subgraph view of the undirected network (no copy)
+    subgraph = G_und.subgraph(nodes_within_tract)
     
     # 2. Remove isolated nodes, keeping only the largest connected component for analysis
-    #    For a directed graph, we check for "weakly connected components"
+    #    On the undirected network these are the "weakly connected components" of the directed graph
     #    This ensures that parts that are geographically connected but appear disconnected due to one-way streets are still treated as a single component
     if subgraph.number_of_nodes() > 0:
-        largest_cc_nodes = max(nx.weakly_connected_components(subgraph), key=len)
-        subgraph = subgraph.subgraph(largest_cc_nodes).copy()
+        largest_cc_nodes = max(nx.connected_components(subgraph), key=len)
+        subgraph = G_und.subgraph(largest_cc_nodes)
 
     # If there are too few nodes after cleaning, skip again
     if subgraph.number_of_nodes() < 3 or subgraph.number_of_edges() == 0:
         results.append({'GEOID': tract_geoid, 'error': 'Subgraph not viable'})
         continue
-        
-    # 3. Calculate the four UTRI metrics
-    metrics = {'GEOID': tract_geoid}
     
-    # Metric 1: Global Permeability -> Global Efficiency
-    try:
-        temp_undirected_graph = nx.Graph(subgraph)
-        metrics['global_permeability'] = nx.global_efficiency(temp_undirected_graph)
-    except Exception: metrics['global_permeability'] = None
+    # Number of source nodes to sample for the shortest-path metrics (None = all nodes)
+    sample_sources = None if args.exact or subgraph.number_of_nodes() <= SAMPLING_MIN_NODES else SAMPLED_SOURCES
     
-    # Metric 2: Average Clustering Coefficient
-    try:
-        temp_graph = nx.Graph(subgraph)
-        metrics['avg_clustering_coeff'] = nx.average_clustering(temp_graph)
-    except Exception: metrics['avg_clustering_coeff'] = None
-    
-    # Metric 3: Degree Assortativity
-    try: metrics['degree_assortativity'] = nx.degree_assortativity_coefficient(subgraph)
-    except Exception: metrics['degree_assortativity'] = None
-    
-    # Metric 4: Gini Coeff of Edge Betweenness
-    try:
-        edge_betweenness = nx.edge_betweenness_centrality(subgraph, weight='length')
-        metrics['gini_edge_betweenness'] = gini_coefficient(list(edge_betweenness.values()))
-    except Exception: metrics['gini_edge_betweenness'] = None
+    # The same component in the directed road network (one-way streets and parallel edges kept);
+    # this copy is all a worker needs to compute the tract's metrics
+    tract_jobs.append((tract_geoid, G.subgraph(largest_cc_nodes).copy(), sample_sources))
 
-    results.append(metrics)
+# 3. Calculate the four UTRI metrics. The tracts are independent, so they are spread over all CPU cores
+#    (processes rather than threads, as NetworkX is pure Python and would be serialized by the GIL)
+metrics_per_tract = Parallel(n_jobs=-1, backend='loky', return_as='generator')(
+    delayed(compute_tract_metrics)(*job) for job in tract_jobs
+)
+results.extend(tqdm(metrics_per_tract, total=len(tract_jobs), desc="Processing Tracts"))
 
 print("\nMetrics calculation complete.")
 
@@ -0,0 +1,20 @@
+import os
+import pandas as pd
+
+# Shared loader for the analysis scripts (basic_analysis.py, DC_TRVI_Spatial_Analysis.py)
+UTRI_CSV = 'dc_utri_analysis.csv'
+UTRI_CLEAN_PARQUET = 'dc_utri_analysis_clean.parquet'
+UTRI_COLUMNS = ['global_permeability', 'avg_clustering_coeff', 'degree_assortativity', 'gini_edge_betweenness', 'Median_Household_Income']
+
+# Tracts of dc_utri_analysis.csv that have all four UTRI metrics and a median income.
+# The CSV is only parsed and cleaned when it is newer than dc_utri_analysis_clean.parquet;
+# otherwise the cleaned subset is read back from that parquet file.
+# Raises FileNotFoundError if the CSV does not exist.
+def load_clean_utri():
+    csv_mtime = os.path.getmtime(UTRI_CSV)
+    if os.path.exists(UTRI_CLEAN_PARQUET) and os.path.getmtime(UTRI_CLEAN_PARQUET) >= csv_mtime:
+        return pd.read_parquet(UTRI_CLEAN_PARQUET)
+
+    df_clean = pd.read_csv(UTRI_CSV).dropna(subset=UTRI_COLUMNS)
+    df_clean.to_parquet(UTRI_CLEAN_PARQUET)
+    return df_clean